@@ -2,9 +2,16 @@ import tkinter as tk
 from tkinter import ttk, scrolledtext, messagebox
 import threading
 import time
-from mic1_hardware import MIC1Hardware #módulo local
+from collections import deque
+from mic1_hardware import MIC1Hardware, format_event #módulo local
 from assembler import MIC1Assembler #módulo local
 
+#Máximo de linhas no histórico (acima disso as mais antigas saem, p/ o widget não ficar lento)
+MAX_LOG_LINES = 1000
+
+#Filtro em que cada tipo de evento do hardware se encaixa (None = sempre aparece)
+EVENT_FILTERS = {'HIT': 'HIT', 'MISS': 'MISS', 'WRITEBACK': 'WRITEBACK', 'FLUSH': 'WRITEBACK', 'MICRO': 'MICRO'}
+
 #Classe principal da nossa interface gráfica
 class MIC1SimulatorApp:
     def __init__(self, root):
@@ -26,6 +33,7 @@ class MIC1SimulatorApp:
         self.cpu = MIC1Hardware()
         self.assembler = MIC1Assembler()
         self.running = False 
+        self.log_history = deque(maxlen=MAX_LOG_LINES) #(filtro, texto) das últimas linhas
         self.create_widgets()
         
         #Preencher a tabela de memória
@@ -81,6 +89,17 @@ class MIC1SimulatorApp:
 
         #Log de microinstruções
         ttk.Label(left_panel, text="Histórico de Microinstruções").pack(anchor="w", pady=(10,0))
+
+        #Filtros do histórico
+        filter_frame = ttk.Frame(left_panel)
+        filter_frame.pack(fill=tk.X)
+        self.log_filters = {}
+        for key, text in (('HIT', "HIT"), ('MISS', "MISS"), ('WRITEBACK', "Write-Back"), ('MICRO', "MICRO")):
+            var = tk.BooleanVar(value=True)
+            tk.Checkbutton(filter_frame, text=text, variable=var, command=self.refresh_log, bg="#2b2b2b", fg="white",
+                           selectcolor="#333", activebackground="#2b2b2b", activeforeground="white").pack(side=tk.LEFT)
+            self.log_filters[key] = var
+
         self.log_display = scrolledtext.ScrolledText(left_panel, height=12, font=("Consolas", 9), bg="#000", fg="#0f0")
         self.log_display.pack(fill=tk.BOTH, expand=True)
 
@@ -188,7 +207,7 @@ class MIC1SimulatorApp:
             return
             
         self.cpu.reset()
-        self.cpu.load_program(binary)
+        self.cpu.load_program(binary, self.assembler.labels)
         self.update_full_memory_view()
         self.update_ui()
         self.log("Programa compilado e carregado com sucesso.")
@@ -232,28 +251,52 @@ class MIC1SimulatorApp:
             data_str = str([f"{x:04X}" for x in line.data])
             self.i_cache_tree.insert("", "end", values=(i, line.valid, line.tag, line.dirty, data_str))
 
-        #Logs do sistema (cache hit, cache miss e microinstruções)
-        for log in self.cpu.data_cache.log:
-            self.log(f"[D-CACHE] {log}")
-        self.cpu.data_cache.log.clear()
-        
-        for log in self.cpu.inst_cache.log:
-            self.log(f"[I-CACHE] {log}")
-        self.cpu.inst_cache.log.clear()
-        
-        for micro in self.cpu.micro_log:
-            self.log(f"[MICRO] {micro}")
+        #Logs do sistema (cache hit, cache miss e microinstruções): tudo que chegou desde o último frame
+        records = self.cpu.event_log.drain()
+        self.append_log([(EVENT_FILTERS.get(r[1]), format_event(r)) for r in records])
 
     def log(self, msg):
-        self.log_display.insert(tk.END, msg + "\n")
+        self.append_log([(None, msg)])
+
+    def _log_visible(self, category):
+        return category is None or self.log_filters[category].get()
+
+    #Um único insert por frame, depois corta o começo p/ manter no máximo MAX_LOG_LINES linhas
+    def append_log(self, entries):
+        if not entries:
+            return
+        self.log_history.extend(entries)
+        lines = [text for category, text in entries[-MAX_LOG_LINES:] if self._log_visible(category)]
+        if not lines:
+            return
+        self.log_display.insert(tk.END, "\n".join(lines) + "\n")
+        total = int(self.log_display.index("end-1c").split(".")[0]) - 1
+        if total > MAX_LOG_LINES:
+            self.log_display.delete("1.0", f"{total - MAX_LOG_LINES + 1}.0")
+        self.log_display.see(tk.END)
+
+    #Filtro mudou: redesenha o histórico guardado de uma vez
+    def refresh_log(self):
+        self.log_display.delete("1.0", tk.END)
+        lines = [text for category, text in self.log_history if self._log_visible(category)]
+        if lines:
+            self.log_display.insert(tk.END, "\n".join(lines) + "\n")
         self.log_display.see(tk.END)
 
     #Loop da thread de execução
     def run_loop(self):
+        if self.cpu.break_at_current_pc():
+            self.root.after(0, self.log, f"[DEBUG] {self.cpu.stop_reason}: {self.cpu.stop_info}")
+            self.running = False
+            return
         while self.running and not self.cpu.halted:
             self.cpu.step()
             # "after" é necessário porque Tkinter não é thread-safe
             self.root.after(0, self.update_ui)
+            #Parou num breakpoint/watchpoint: pausa a execução contínua
+            if self.cpu.stop_reason in ('BREAKPOINT', 'WATCH_READ', 'WATCH_WRITE'):
+                self.root.after(0, self.log, f"[DEBUG] {self.cpu.stop_reason}: {self.cpu.stop_info}")
+                break
             time.sleep(1.0 / self.speed_scale.get())
         
         self.running = False
@@ -275,6 +318,7 @@ class MIC1SimulatorApp:
     def reset_simulation(self):
         self.pause_simulation()
         self.cpu.reset()
+        self.log_history.clear()
         self.log_display.delete("1.0", tk.END)
         self.update_full_memory_view()
         self.update_ui()
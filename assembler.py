@@ -16,6 +16,8 @@ class MIC1Assembler:
             'INSP': 0b1111110000000000, 'DESP': 0b1111111000000000,
             'HALT': 0b1111111111111111
         }
+        #Labels da última compilação (usadas p/ breakpoints por nome no hardware)
+        self.labels = {}
 
     def compile(self, text):
         raw_lines = text.split('\n')
@@ -45,6 +47,8 @@ class MIC1Assembler:
                 instructions.append(clean)
                 address_counter += 1
 
+        self.labels = labels
+
         #Agora, na segunda passada, convertemos as instruções para código binário
         binary_code = []
         errors = []
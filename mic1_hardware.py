@@ -1,4 +1,54 @@
+import ast
 import random
+from collections import deque
+
+#Log de eventos em buffer circular. Guarda registros (tuplas), não strings prontas:
+#(origem, tipo, operação, endereço, extra). Quem for mostrar formata com format_event()
+#Como o deque tem tamanho fixo, a memória fica constante mesmo em execuções muito longas
+class EventLog:
+    def __init__(self, maxlen=4096):
+        self.records = deque(maxlen=maxlen)
+        self.append = self.records.append #Atalho: o append é chamado em todo acesso às caches
+
+    def __len__(self):
+        return len(self.records)
+
+    #Retira tudo que está no buffer de uma vez (a interface chama isso uma vez por frame)
+    #popleft um a um porque a thread de execução pode estar dando append ao mesmo tempo
+    def drain(self):
+        popleft = self.records.popleft
+        return [popleft() for _ in range(len(self.records))]
+
+    def clear(self):
+        self.records.clear()
+
+#Converte um registro do EventLog no texto mostrado no histórico
+def format_event(record):
+    source, kind, op, addr, extra = record
+    if kind == 'MICRO':
+        return f"[MICRO] {extra}"
+    if kind == 'HIT':
+        #Nas caches MESI o extra é (linha, estado antes do acesso)
+        if isinstance(extra, tuple):
+            line_idx, state = extra
+            detail = f"L{line_idx}, {state} -> M" if op == 'W' and state != 'M' else f"L{line_idx}, {state}"
+            return f"[{source}] Cache {'WRITE ' if op == 'W' else ''}HIT em {addr} ({detail})"
+        return f"[{source}] Cache {'WRITE ' if op == 'W' else ''}HIT em {addr} (L{extra})"
+    if kind == 'MISS':
+        if extra:
+            return f"[{source}] Cache {'WRITE ' if op == 'W' else ''}MISS em {addr} -> {extra}"
+        if op == 'W':
+            return f"[{source}] Cache WRITE MISS em {addr}. Alocando..."
+        return f"[{source}] Cache MISS em {addr}. Buscando RAM..."
+    if kind == 'WRITEBACK':
+        return f"[{source}] Write-Back: Salvando Bloco {addr} na RAM"
+    if kind == 'FLUSH':
+        return f"[{source}] FLUSH: {extra} blocos sincronizados com a RAM."
+    if kind == 'UPGRADE':
+        return f"[{source}] BusUpgr em {addr} (S -> M)"
+    if kind == 'SNOOP':
+        return f"[{source}] SNOOP: Bloco {addr} invalidado por escrita do core {extra}"
+    return f"[{source}] {kind} {addr} {extra}"
 
 #Linha individual da Cache
 #Possui tag, bit de validade e o dirty-bit para copy-back, como aprendido em sala
@@ -11,7 +61,7 @@ class CacheLine:
 
 #Implementação da estrutura de Cache (usamos mapeamento direto, para facilitar)
 class Cache:
-    def __init__(self, memory_ref, num_lines=8, block_size=4):
+    def __init__(self, memory_ref, num_lines=8, block_size=4, name='CACHE', log=None):
         self.memory_ref = memory_ref #Referência p/a RAM
         self.num_lines = num_lines
         self.block_size = block_size
@@ -21,7 +71,8 @@ class Cache:
         #Contadores de desempenho
         self.hits = 0
         self.misses = 0
-        self.log = [] #Log interno p/ debug na interface
+        self.name = name #Origem dos eventos no log (I-CACHE/D-CACHE)
+        self.log = log if log is not None else EventLog() #Pode ser compartilhado com o hardware
 
     #Calcula o índice da linha na cache
     def _get_line_index(self, address):
@@ -46,12 +97,12 @@ class Cache:
         #Verifica se deu cache hit (se está válido e a tag bate com a esperada)
         if line.valid and line.tag == tag:
             self.hits += 1
-            self.log.append(f"Cache HIT em {address} (L{line_idx})")
+            self.log.append((self.name, 'HIT', 'R', address, line_idx))
             return line.data[offset]
         else:
             #Caso contrário, é cache miss
             self.misses += 1
-            self.log.append(f"Cache MISS em {address}. Buscando RAM...")
+            self.log.append((self.name, 'MISS', 'R', address, None))
             
             # Importante: Antes de sobrescrever, verificar se precisa salvar na RAM (Write-Back)
             if line.valid and line.dirty:
@@ -81,7 +132,7 @@ class Cache:
         #Se tentar escrever e não tiver na cache, puxamos da RAM primeiro, alocamos e depois modificamos.
         if not (line.valid and line.tag == tag):
             self.misses += 1
-            self.log.append(f"Cache WRITE MISS em {address}. Alocando...")
+            self.log.append((self.name, 'MISS', 'W', address, None))
             
             #Se a linha antiga estava suja, salva antes
             if line.valid and line.dirty:
@@ -96,7 +147,7 @@ class Cache:
             line.tag = tag
         else:
             self.hits += 1
-            self.log.append(f"Cache WRITE HIT em {address}")
+            self.log.append((self.name, 'HIT', 'W', address, line_idx))
 
         #Escreve apenas na cache e faz a marcação do dirty-bit
         line.data[offset] = value
@@ -108,7 +159,7 @@ class Cache:
         #Recalcula o endereço original baseado na tag
         old_block_addr = (line.tag * self.num_lines * self.block_size) + (line_idx * self.block_size)
         
-        self.log.append(f"Write-Back: Salvando Bloco {old_block_addr} na RAM")
+        self.log.append((self.name, 'WRITEBACK', None, old_block_addr, None))
         
         for i in range(self.block_size):
             if old_block_addr + i < len(self.memory_ref):
@@ -124,18 +175,23 @@ class Cache:
                 self._write_back_line(i)
                 flushed_count += 1
         if flushed_count > 0:
-            self.log.append(f"FLUSH: {flushed_count} blocos sincronizados com a RAM.")
+            self.log.append((self.name, 'FLUSH', None, None, flushed_count))
 
 #Simulação do hardware principal
 class MIC1Hardware:
-    def __init__(self):
+    #Opcodes de salto (JPOS, JZER, JUMP, JNEG, JNZE): saltar p/ si mesmo nunca muda o estado
+    JUMP_OPCODES = frozenset((0b0100, 0b0101, 0b0110, 0b1100, 0b1101))
+
+    def __init__(self, loop_detection=False, trace_micro=True):
         self.MEMORY_SIZE = 4096
         self.memory = [0] * self.MEMORY_SIZE
+        #Log de eventos (caches + microinstruções) compartilhado, lido pela interface
+        self.event_log = EventLog()
         
         #Escolhemos usar a arquitetura de Harvard, que consiste na divisão em cache de instrução e cache de dados
         #Isso ajuda a facilitar a visualização na interface gráfica, separando o acesso de fetch do acesso de operando.
-        self.inst_cache = Cache(self.memory, num_lines=8, block_size=4)
-        self.data_cache = Cache(self.memory, num_lines=8, block_size=4)
+        self.inst_cache = Cache(self.memory, num_lines=8, block_size=4, name='I-CACHE', log=self.event_log)
+        self.data_cache = Cache(self.memory, num_lines=8, block_size=4, name='D-CACHE', log=self.event_log)
 
         #Inicialização dos registradores
         self.registers = {
@@ -145,25 +201,175 @@ class MIC1Hardware:
         }
         self.halted = False
         self.micro_log = [] #Log das microoperações p/ mostrar passo a passo
+        #Sem ninguém p/ ler (servidor, execução em lote) as microoperações nem são montadas
+        self.trace_micro = trace_micro
+
+        #Depuração: breakpoints no PC e watchpoints de memória
+        #Tudo em sets, então com nada armado a checagem é só um teste de set vazio
+        self.breakpoints = set()
+        self.break_conditions = {} #Endereço -> condição já compilada (ex: "AC < 0")
+        self.read_watch = set()
+        self.write_watch = set()
+        self.labels = {} #Labels do assembler, p/ breakpoints por nome
+        self.stop_reason = None #Motivo da última parada (HALT, BREAKPOINT, WATCH_READ, LOOP, ...)
+        self.stop_info = None
+
+        #Detecção de loop infinito (opcional). A cada loop_check_interval ciclos guardamos
+        #o estado (PC, AC, SP, geração de escrita); se um estado se repete, a máquina está presa
+        self.loop_detection = loop_detection
+        self.loop_check_interval = 64
+        #Amostragem de estados: só vale se ninguém mais escreve na memória. No multi-core fica
+        #desligada e o sistema amostra o estado de todos os cores juntos
+        self.loop_sampling = True
+        self.mem_write_gen = 0 #Incrementa a cada escrita de dados
+        self._reset_loop_state()
 
     #Reinicia o estado da máquina (botão reset)
     def reset(self):
         self.memory = [0] * self.MEMORY_SIZE
+        self.event_log.clear()
         # Recria as caches zeradas
-        self.inst_cache = Cache(self.memory, num_lines=8, block_size=4)
-        self.data_cache = Cache(self.memory, num_lines=8, block_size=4)
+        self.inst_cache = Cache(self.memory, num_lines=8, block_size=4, name='I-CACHE', log=self.event_log)
+        self.data_cache = Cache(self.memory, num_lines=8, block_size=4, name='D-CACHE', log=self.event_log)
         
         self.registers = {k: 0 for k in self.registers}
         self.registers['SP'] = 4095
         self.halted = False
         self.micro_log = []
+        #Breakpoints e watchpoints continuam armados depois do reset, como num debugger
+        self.labels = {}
+        self.stop_reason = None
+        self.stop_info = None
+        self.mem_write_gen = 0
+        self._reset_loop_state()
 
     #Carrega o binário gerado pelo assembler direto na memória
-    def load_program(self, program_data):
+    def load_program(self, program_data, labels=None):
         self.reset()
         for i, value in enumerate(program_data):
             if i < self.MEMORY_SIZE:
                 self.memory[i] = value
+        if labels:
+            self.labels = dict(labels)
+
+    #Converte um label (ou número) para endereço de memória
+    def _resolve_address(self, location):
+        if isinstance(location, str):
+            if location in self.labels:
+                return self.labels[location]
+            try:
+                return int(location)
+            except ValueError:
+                raise ValueError(f"Label '{location}' não existe.")
+        return location
+
+    #Nós permitidos numa condição de breakpoint: comparações e aritmética com registradores e números
+    #Pow e shift ficam de fora p/ ninguém montar um número gigante (ex: 9**9**9), e divisão
+    #p/ a avaliação nunca poder falhar no meio do step() (divisão por zero)
+    #Operadores listados um a um: as classes base (cmpop etc.) deixariam passar `in`/`is`
+    CONDITION_NODES = (ast.Expression, ast.Compare, ast.BoolOp, ast.UnaryOp, ast.BinOp, ast.Constant,
+                       ast.Name, ast.Load,
+                       ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE,
+                       ast.And, ast.Or, ast.Not, ast.USub, ast.UAdd, ast.Invert,
+                       ast.Add, ast.Sub, ast.Mult, ast.BitAnd, ast.BitOr, ast.BitXor)
+
+    #Valida a condição (só registradores, números e operadores) e compila uma única vez
+    def _compile_condition(self, condition, addr):
+        try:
+            tree = ast.parse(condition, mode='eval')
+        except SyntaxError:
+            raise ValueError(f"Condição inválida: '{condition}'.")
+        for node in ast.walk(tree):
+            if not isinstance(node, self.CONDITION_NODES):
+                raise ValueError(f"Condição inválida: '{condition}' (não aceita {type(node).__name__}).")
+            if isinstance(node, ast.Name) and node.id not in self.registers:
+                raise ValueError(f"Condição inválida: registrador '{node.id}' não existe.")
+            if isinstance(node, ast.Constant) and type(node.value) not in (int, bool):
+                raise ValueError(f"Condição inválida: '{condition}' (só aceita números inteiros).")
+        return compile(tree, f"<breakpoint {addr}>", "eval")
+
+    #Arma um breakpoint no endereço/label. A condição (ex: "AC < 0") é validada e compilada aqui
+    def add_breakpoint(self, location, condition=None):
+        addr = self._resolve_address(location)
+        code = self._compile_condition(condition, addr) if condition else None
+        self.breakpoints.add(addr)
+        if code is not None:
+            self.break_conditions[addr] = code
+        else:
+            self.break_conditions.pop(addr, None)
+        return addr
+
+    def remove_breakpoint(self, location):
+        addr = self._resolve_address(location)
+        self.breakpoints.discard(addr)
+        self.break_conditions.pop(addr, None)
+
+    #Valida o intervalo de um watchpoint e corta no tamanho da memória
+    def _watch_range(self, start, end, mode):
+        if mode not in ('r', 'w', 'rw'):
+            raise ValueError(f"Modo de watchpoint inválido: '{mode}' (use 'r', 'w' ou 'rw').")
+        start = self._resolve_address(start)
+        end = start if end is None else self._resolve_address(end)
+        if start > end:
+            raise ValueError(f"Intervalo de watchpoint inválido: {start} > {end}.")
+        start, end = max(0, start), min(self.MEMORY_SIZE - 1, end)
+        if start > end:
+            raise ValueError("Intervalo de watchpoint fora da memória.")
+        return range(start, end + 1)
+
+    #Arma um watchpoint no intervalo [start, end] da memória. mode: 'r', 'w' ou 'rw'
+    def add_watchpoint(self, start, end=None, mode='rw'):
+        addrs = self._watch_range(start, end, mode)
+        if 'r' in mode:
+            self.read_watch.update(addrs)
+        if 'w' in mode:
+            self.write_watch.update(addrs)
+
+    def remove_watchpoint(self, start, end=None, mode='rw'):
+        addrs = self._watch_range(start, end, mode)
+        if 'r' in mode:
+            self.read_watch.difference_update(addrs)
+        if 'w' in mode:
+            self.write_watch.difference_update(addrs)
+
+    def clear_debug(self):
+        self.breakpoints.clear()
+        self.break_conditions.clear()
+        self.read_watch.clear()
+        self.write_watch.clear()
+
+    #Só é chamada quando o PC caiu num endereço com breakpoint
+    def _check_breakpoint(self, pc):
+        if self.halted:
+            return
+        cond = self.break_conditions.get(pc)
+        if cond is not None:
+            #Registradores em signed, p/ condições como "AC < 0" fazerem sentido
+            env = {reg: (v - 65536 if v > 32767 else v) for reg, v in self.registers.items()}
+            if not eval(cond, {'__builtins__': {}}, env):
+                return
+        self.stop_reason = 'BREAKPOINT'
+        self.stop_info = {'pc': pc}
+
+    #O step() só confere breakpoints no PC de destino; antes de começar uma execução
+    #conferimos também o PC atual (ponto de entrada, ou breakpoint armado enquanto parado aqui)
+    #Retomando de uma parada nesse mesmo breakpoint, ele é pulado uma vez
+    #Retorna True se a execução deve parar sem executar nada
+    def break_at_current_pc(self):
+        pc = self.registers['PC']
+        if self.halted or not self.breakpoints or pc not in self.breakpoints:
+            return False
+        if self.stop_reason == 'BREAKPOINT' and self.stop_info and self.stop_info['pc'] == pc:
+            return False
+        self.stop_reason = None
+        self.stop_info = None
+        self._check_breakpoint(pc)
+        return self.stop_reason == 'BREAKPOINT'
+
+    def _watch_hit(self, reason, addr, val):
+        self.stop_reason = reason
+        self.stop_info = {'pc': self.registers['PC'] - 1, 'addr': addr, 'value': val}
+        self.micro_log.append(f"[DEBUG] {reason} em Mem[{addr}] ({val})")
                 
     #Função para buscar instrução (cache de inst)
     def _fetch_instruction(self, addr):
@@ -180,6 +386,8 @@ class MIC1Hardware:
             self.registers['MAR'] = addr
             val = self.data_cache.read(addr)
             self.registers['MBR'] = val
+            if self.read_watch and addr in self.read_watch:
+                self._watch_hit('WATCH_READ', addr, val)
             return val
         return 0
 
@@ -189,6 +397,9 @@ class MIC1Hardware:
             self.registers['MAR'] = addr
             self.registers['MBR'] = val
             self.data_cache.write(addr, val)
+            self.mem_write_gen += 1
+            if self.write_watch and addr in self.write_watch:
+                self._watch_hit('WATCH_WRITE', addr, val)
 
     #Executa um ciclo completo (fetch -> decode -> execute)
 
@@ -198,14 +409,18 @@ class MIC1Hardware:
         pc = self.registers['PC']
         if pc >= self.MEMORY_SIZE:
             self.halted = True
+            self.stop_reason = 'PC_OVERFLOW'
             return
 
         self.micro_log.clear()
+        trace = self.trace_micro
+        self.stop_reason = None
+        self.stop_info = None
         
         #Etapa 1: FETCH
-        self.micro_log.append(f"[FETCH] MAR <- PC ({pc}); RD (I-Cache);")
+        if trace: self.micro_log.append(f"[FETCH] MAR <- PC ({pc}); RD (I-Cache);")
         instruction = self._fetch_instruction(pc)
-        self.micro_log.append(f"[FETCH] PC <- PC + 1; IR <- MBR ({instruction});")
+        if trace: self.micro_log.append(f"[FETCH] PC <- PC + 1; IR <- MBR ({instruction});")
         self.registers['IR'] = instruction
         self.registers['PC'] += 1
         
@@ -217,28 +432,28 @@ class MIC1Hardware:
         #Implementação do instruction set com verificação binária
         
         if opcode_4 == 0b0000: #LODD - carrega direto do endereço
-            self.micro_log.append(f"[LODD] MAR <- {operand_12}; RD (D-Cache);")
+            if trace: self.micro_log.append(f"[LODD] MAR <- {operand_12}; RD (D-Cache);")
             val = self._read_data(operand_12)
             self.registers['AC'] = val
-            self.micro_log.append(f"[LODD] AC <- MBR ({val});")
+            if trace: self.micro_log.append(f"[LODD] AC <- MBR ({val});")
             
         elif opcode_4 == 0b0001: #STOD - salva acumulador na memória
             val = self.registers['AC']
             self._write_data(operand_12, val)
-            self.micro_log.append(f"[STOD] MAR <- {operand_12}; MBR <- AC ({val}); WR (D-Cache);")
+            if trace: self.micro_log.append(f"[STOD] MAR <- {operand_12}; MBR <- AC ({val}); WR (D-Cache);")
             
         elif opcode_4 == 0b0010: #ADDD
             val = self._read_data(operand_12)
             # Mascara 16 bits
             res = (self.registers['AC'] + val) & 0b1111111111111111
             self.registers['AC'] = res
-            self.micro_log.append(f"[ADDD] AC <- AC + MBR ({res});")
+            if trace: self.micro_log.append(f"[ADDD] AC <- AC + MBR ({res});")
             
         elif opcode_4 == 0b0011: #SUBD
             val = self._read_data(operand_12)
             res = (self.registers['AC'] - val) & 0b1111111111111111
             self.registers['AC'] = res
-            self.micro_log.append(f"[SUBD] AC <- AC - MBR ({res});")
+            if trace: self.micro_log.append(f"[SUBD] AC <- AC - MBR ({res});")
             
         elif opcode_4 == 0b0100: #JPOS - pulo condicional
             # Conversão rápida para signed pra checar positivo
@@ -247,71 +462,71 @@ class MIC1Hardware:
             
             if ac_signed >= 0:
                 self.registers['PC'] = operand_12
-                self.micro_log.append(f"[JPOS] AC >= 0. PC <- {operand_12}")
+                if trace: self.micro_log.append(f"[JPOS] AC >= 0. PC <- {operand_12}")
             else:
-                self.micro_log.append(f"[JPOS] AC < 0. Salto ignorado.")
+                if trace: self.micro_log.append(f"[JPOS] AC < 0. Salto ignorado.")
 
         elif opcode_4 == 0b0101: #JZER
             if self.registers['AC'] == 0:
                 self.registers['PC'] = operand_12
-                self.micro_log.append(f"[JZER] AC == 0. PC <- {operand_12}")
+                if trace: self.micro_log.append(f"[JZER] AC == 0. PC <- {operand_12}")
             else:
-                self.micro_log.append(f"[JZER] AC != 0. Salto ignorado.")
+                if trace: self.micro_log.append(f"[JZER] AC != 0. Salto ignorado.")
                 
         elif opcode_4 == 0b0110: #JUMP - incondicional
             self.registers['PC'] = operand_12
-            self.micro_log.append(f"[JUMP] PC <- {operand_12}")
+            if trace: self.micro_log.append(f"[JUMP] PC <- {operand_12}")
             
         elif opcode_4 == 0b0111: #LOCO - carrega constante
             self.registers['AC'] = operand_12
-            self.micro_log.append(f"[LOCO] AC <- {operand_12}")
+            if trace: self.micro_log.append(f"[LOCO] AC <- {operand_12}")
             
         elif opcode_4 == 0b1000: #LODL - load local (relativo à pilha)
             addr = (self.registers['SP'] + operand_12) & 0b1111111111111111
             val = self._read_data(addr)
             self.registers['AC'] = val
-            self.micro_log.append(f"[LODL] MAR <- SP + {operand_12}; RD; AC <- MBR")
+            if trace: self.micro_log.append(f"[LODL] MAR <- SP + {operand_12}; RD; AC <- MBR")
             
         elif opcode_4 == 0b1001: #STOL
             addr = (self.registers['SP'] + operand_12) & 0b1111111111111111
             val = self.registers['AC']
             self._write_data(addr, val)
-            self.micro_log.append(f"[STOL] MAR <- SP + {operand_12}; MBR <- AC; WR")
+            if trace: self.micro_log.append(f"[STOL] MAR <- SP + {operand_12}; MBR <- AC; WR")
             
         elif opcode_4 == 0b1010: #ADDL
             addr = (self.registers['SP'] + operand_12) & 0b1111111111111111
             val = self._read_data(addr)
             self.registers['AC'] = (self.registers['AC'] + val) & 0b1111111111111111
-            self.micro_log.append(f"[ADDL] AC <- AC + Mem[SP+{operand_12}]")
+            if trace: self.micro_log.append(f"[ADDL] AC <- AC + Mem[SP+{operand_12}]")
             
         elif opcode_4 == 0b1011: #SUBL
             addr = (self.registers['SP'] + operand_12) & 0b1111111111111111
             val = self._read_data(addr)
             self.registers['AC'] = (self.registers['AC'] - val) & 0b1111111111111111
-            self.micro_log.append(f"[SUBL] AC <- AC - Mem[SP+{operand_12}]")
+            if trace: self.micro_log.append(f"[SUBL] AC <- AC - Mem[SP+{operand_12}]")
             
         elif opcode_4 == 0b1100: #JNEG
             ac_signed = self.registers['AC']
             if ac_signed > 32767: ac_signed -= 65536
             if ac_signed < 0:
                 self.registers['PC'] = operand_12
-                self.micro_log.append(f"[JNEG] AC < 0. PC <- {operand_12}")
+                if trace: self.micro_log.append(f"[JNEG] AC < 0. PC <- {operand_12}")
             else:
-                self.micro_log.append(f"[JNEG] Salto ignorado.")
+                if trace: self.micro_log.append(f"[JNEG] Salto ignorado.")
                 
         elif opcode_4 == 0b1101: #JNZE
             if self.registers['AC'] != 0:
                 self.registers['PC'] = operand_12
-                self.micro_log.append(f"[JNZE] AC != 0. PC <- {operand_12}")
+                if trace: self.micro_log.append(f"[JNZE] AC != 0. PC <- {operand_12}")
             else:
-                self.micro_log.append(f"[JNZE] Salto ignorado.")
+                if trace: self.micro_log.append(f"[JNZE] Salto ignorado.")
                 
         elif opcode_4 == 0b1110: #CALL
             sp = (self.registers['SP'] - 1) & 0b1111111111111111
             self.registers['SP'] = sp
             self._write_data(sp, self.registers['PC']) #Salva endereço de retorno
             self.registers['PC'] = operand_12
-            self.micro_log.append(f"[CALL] SP<-SP-1; Mem[SP]<-PC; PC<-{operand_12}")
+            if trace: self.micro_log.append(f"[CALL] SP<-SP-1; Mem[SP]<-PC; PC<-{operand_12}")
             
         elif opcode_4 == 0b1111: #Instruções estendidas/ operações de pilha
             high_byte = instruction >> 8
@@ -319,12 +534,12 @@ class MIC1Hardware:
             if high_byte == 0b11111100: #INSP
                 y = instruction & 0b11111111
                 self.registers['SP'] = (self.registers['SP'] + y) & 0b1111111111111111
-                self.micro_log.append(f"[INSP] SP <- SP + {y}")
+                if trace: self.micro_log.append(f"[INSP] SP <- SP + {y}")
 
             elif high_byte == 0b11111110: #DESP
                 y = instruction & 0b11111111
                 self.registers['SP'] = (self.registers['SP'] - y) & 0b1111111111111111
-                self.micro_log.append(f"[DESP] SP <- SP - {y}")
+                if trace: self.micro_log.append(f"[DESP] SP <- SP - {y}")
             
             elif instruction == 0b1111000000000000: #PSHI (push indireto)
                 addr = self.registers['AC']
@@ -332,7 +547,7 @@ class MIC1Hardware:
                 sp = (self.registers['SP'] - 1) & 0b1111111111111111
                 self.registers['SP'] = sp
                 self._write_data(sp, val)
-                self.micro_log.append(f"[PSHI] Push Indirect: Stack <- Mem[AC:{addr}] ({val})")
+                if trace: self.micro_log.append(f"[PSHI] Push Indirect: Stack <- Mem[AC:{addr}] ({val})")
 
             elif instruction == 0b1111001000000000: #POPI (pop indireto)
                 sp = self.registers['SP']
@@ -340,40 +555,122 @@ class MIC1Hardware:
                 addr = self.registers['AC']
                 self._write_data(addr, val)
                 self.registers['SP'] = (sp + 1) & 0b1111111111111111
-                self.micro_log.append(f"[POPI] Pop Indirect: Mem[AC:{addr}] <- Stack ({val})")
+                if trace: self.micro_log.append(f"[POPI] Pop Indirect: Mem[AC:{addr}] <- Stack ({val})")
 
             elif instruction == 0b1111100000000000: #RETN
                 sp = self.registers['SP']
                 ret_addr = self._read_data(sp)
                 self.registers['PC'] = ret_addr
                 self.registers['SP'] = (sp + 1) & 0b1111111111111111
-                self.micro_log.append("[RETN] PC <- Mem[SP]; SP <- SP + 1")
+                if trace: self.micro_log.append("[RETN] PC <- Mem[SP]; SP <- SP + 1")
                 
             elif instruction == 0b1111101000000000: #SWAP
                 temp = self.registers['AC']
                 self.registers['AC'] = self.registers['SP']
                 self.registers['SP'] = temp
-                self.micro_log.append("[SWAP] AC <-> SP")
+                if trace: self.micro_log.append("[SWAP] AC <-> SP")
                 
             elif instruction == 0b1111010000000000: #PUSH
                 sp = (self.registers['SP'] - 1) & 0b1111111111111111
                 self.registers['SP'] = sp
                 self._write_data(sp, self.registers['AC'])
-                self.micro_log.append("[PUSH] SP<-SP-1; Mem[SP] <- AC")
+                if trace: self.micro_log.append("[PUSH] SP<-SP-1; Mem[SP] <- AC")
                 
             elif instruction == 0b1111011000000000: #POP
                 sp = self.registers['SP']
                 val = self._read_data(sp)
                 self.registers['AC'] = val
                 self.registers['SP'] = (sp + 1) & 0b1111111111111111
-                self.micro_log.append("[POP] AC <- Mem[SP]; SP<-SP+1")
+                if trace: self.micro_log.append("[POP] AC <- Mem[SP]; SP<-SP+1")
             
             elif instruction == 0b1111111111111111: #HALT
                 self.halted = True
+                self.stop_reason = 'HALT'
                 #O HALT garante que os dados na cache (sujos) vão ser atualizados na memória ao desligar o programa
                 self.data_cache.flush_all() 
                 self.inst_cache.flush_all() 
-                self.micro_log.append("[HALT] Execução finalizada. Caches FLUSHED.")
+                if trace: self.micro_log.append("[HALT] Execução finalizada. Caches FLUSHED.")
             
             else:
-                self.micro_log.append(f"Instrução Desconhecida: {bin(instruction)}")
\ No newline at end of file
+                if trace: self.micro_log.append(f"Instrução Desconhecida: {bin(instruction)}")
+
+        if self.loop_detection:
+            self._check_loop(pc, opcode_4)
+
+        if trace:
+            for micro in self.micro_log:
+                self.event_log.append(('CPU', 'MICRO', None, None, micro))
+
+        #Breakpoint: paramos antes de executar a instrução no novo PC
+        if self.breakpoints and self.registers['PC'] in self.breakpoints:
+            self._check_breakpoint(self.registers['PC'])
+
+    def _reset_loop_state(self):
+        self._loop_countdown = self.loop_check_interval
+        self._loop_seen = set()
+        self._loop_gen = self.mem_write_gen
+        self._loop_target = None #Estado repetido; enquanto não é None estamos medindo o loop
+        self._loop_start = 0
+        self._loop_end = 0
+
+    #Chamada ao fim de cada ciclo quando loop_detection está ligado
+    def _check_loop(self, pc, opcode):
+        if self.halted:
+            return
+        new_pc = self.registers['PC']
+
+        #Salto p/ o próprio endereço: o estado não muda, então detectamos na hora
+        if new_pc == pc and opcode in self.JUMP_OPCODES:
+            self._halt_loop(pc, pc)
+            return
+
+        #Já achamos um estado repetido: damos uma volta no loop anotando os endereços
+        if self._loop_target is not None:
+            if pc < self._loop_start: self._loop_start = pc
+            if pc > self._loop_end: self._loop_end = pc
+            if (new_pc, self.registers['AC'], self.registers['SP'], self.mem_write_gen) == self._loop_target:
+                self._halt_loop(self._loop_start, self._loop_end)
+            return
+
+        if not self.loop_sampling:
+            return
+        self._loop_countdown -= 1
+        if self._loop_countdown:
+            return
+        self._loop_countdown = self.loop_check_interval
+
+        state = (new_pc, self.registers['AC'], self.registers['SP'], self.mem_write_gen)
+        if self.mem_write_gen != self._loop_gen:
+            #Houve escrita na memória: os estados antigos não servem mais
+            self._loop_seen.clear()
+            self._loop_gen = self.mem_write_gen
+        elif state in self._loop_seen:
+            #Sem escrita nenhuma desde então, o programa é determinístico e vai repetir p/ sempre
+            self._loop_target = state
+            self._loop_start = self._loop_end = new_pc
+            return
+        if len(self._loop_seen) >= 4096:
+            self._loop_seen.clear()
+        self._loop_seen.add(state)
+
+    def _halt_loop(self, start, end):
+        self.halted = True
+        self.stop_reason = 'LOOP'
+        self.stop_info = {'start': start, 'end': end}
+        #Mesmo tratamento do HALT, p/ a RAM refletir o estado final
+        self.data_cache.flush_all()
+        self.inst_cache.flush_all()
+        self.micro_log.append(f"[LOOP] Loop infinito detectado em {start}..{end}. Execução finalizada.")
+
+    #Execução headless (sem GUI): roda até HALT, breakpoint/watchpoint ou max_steps ciclos
+    #Retorna o número de ciclos executados; o motivo da parada fica em stop_reason
+    def run(self, max_steps=None):
+        if self.break_at_current_pc():
+            return 0
+        steps = 0
+        while not self.halted and (max_steps is None or steps < max_steps):
+            self.step()
+            steps += 1
+            if self.stop_reason is not None:
+                break
+        return steps
\ No newline at end of file
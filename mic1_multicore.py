@@ -0,0 +1,402 @@
+import random
+from concurrent.futures import ProcessPoolExecutor
+from mic1_hardware import Cache, MIC1Hardware
+
+#Cache privada de um core com o protocolo MESI (snooping)
+#Estados por linha: M (modificada), E (exclusiva limpa), S (compartilhada), I (inválida)
+#valid/dirty continuam coerentes com o estado, p/ a interface e o flush do HALT funcionarem igual
+class MESICache(Cache):
+    def __init__(self, memory_ref, bus, core_id, num_lines=8, block_size=4, name='CACHE', log=None):
+        super().__init__(memory_ref, num_lines=num_lines, block_size=block_size, name=name, log=log)
+        self.bus = bus
+        self.core_id = core_id
+        for line in self.lines:
+            line.state = 'I'
+            line.lost_tag = None #Tag invalidada por outro core (p/ contar miss de coerência)
+
+        #Contadores de coerência
+        self.coherence_misses = 0
+        self.invalidations = 0 #Linhas desta cache invalidadas por escritas de outros caches
+        bus.attach(self)
+
+    #Miss comum: conta, verifica se foi por coerência e despeja a linha antiga
+    def _miss(self, line, line_idx, tag):
+        self.misses += 1
+        if line.lost_tag == tag:
+            self.coherence_misses += 1
+        line.lost_tag = None
+        if line.state == 'M':
+            self._write_back_line(line_idx)
+
+    def _fill(self, line, address, tag, state):
+        block_start = self._get_block_start_address(address)
+        for i in range(self.block_size):
+            if block_start + i < len(self.memory_ref):
+                line.data[i] = self.memory_ref[block_start + i]
+        line.tag = tag
+        line.state = state
+        line.valid = True
+        line.dirty = state == 'M'
+
+    def read(self, address):
+        line_idx = self._get_line_index(address)
+        tag = self._get_tag(address)
+        offset = address % self.block_size
+        line = self.lines[line_idx]
+
+        if line.state != 'I' and line.tag == tag:
+            self.hits += 1
+            self.log.append((self.name, 'HIT', 'R', address, (line_idx, line.state)))
+            return line.data[offset]
+
+        self._miss(line, line_idx, tag)
+        #BusRd: quem tiver o bloco em M faz flush antes de lermos a RAM
+        shared = self.bus.read_miss(self, self._get_block_start_address(address))
+        self._fill(line, address, tag, 'S' if shared else 'E')
+        self.log.append((self.name, 'MISS', 'R', address, line.state))
+        return line.data[offset]
+
+    def write(self, address, value):
+        line_idx = self._get_line_index(address)
+        tag = self._get_tag(address)
+        offset = address % self.block_size
+        line = self.lines[line_idx]
+
+        if line.state != 'I' and line.tag == tag:
+            self.hits += 1
+            self.log.append((self.name, 'HIT', 'W', address, (line_idx, line.state)))
+            if line.state == 'S':
+                #BusUpgr: já temos os dados, só precisamos invalidar as outras cópias
+                self.bus.upgrade(self, self._get_block_start_address(address))
+                self.log.append((self.name, 'UPGRADE', 'W', address, None))
+        else:
+            self._miss(line, line_idx, tag)
+            #BusRdX: busca o bloco já invalidando as outras cópias (write-allocate)
+            self.bus.read_exclusive(self, self._get_block_start_address(address))
+            self._fill(line, address, tag, 'M')
+            self.log.append((self.name, 'MISS', 'W', address, 'M'))
+
+        line.data[offset] = value
+        line.state = 'M'
+        line.dirty = True
+        self.bus.notify_write(self)
+
+    def _write_back_line(self, line_idx):
+        super()._write_back_line(line_idx)
+        line = self.lines[line_idx]
+        if line.state == 'M':
+            line.state = 'E' #Sincronizada com a RAM, mas ainda só nossa
+
+    #Resposta a uma transação de outro cache no barramento. Retorna True se tínhamos o bloco
+    def snoop(self, block_start, exclusive, requester_core):
+        line_idx = self._get_line_index(block_start)
+        tag = self._get_tag(block_start)
+        line = self.lines[line_idx]
+        if line.state == 'I' or line.tag != tag:
+            return False
+
+        if line.state == 'M':
+            self._write_back_line(line_idx)
+            self.bus.flushes += 1
+
+        if exclusive:
+            line.state = 'I'
+            line.valid = False
+            line.dirty = False
+            line.lost_tag = tag
+            self.invalidations += 1
+            self.bus.invalidations += 1
+            self.log.append((self.name, 'SNOOP', None, block_start, requester_core))
+        else:
+            line.state = 'S'
+        return True
+
+    #Descarta tudo (usado quando a RAM muda por fora do barramento)
+    def invalidate_all(self):
+        for line in self.lines:
+            line.state = 'I'
+            line.valid = False
+            line.dirty = False
+            line.lost_tag = None
+
+#Barramento compartilhado: repassa cada transação para os outros caches (snooping)
+class SnoopingBus:
+    def __init__(self):
+        self.caches = []
+        self.cores = []
+
+        self.writes = 0 #Escritas de qualquer core (detecção de loop do sistema)
+
+        #Tráfego no barramento
+        self.bus_reads = 0
+        self.bus_read_exclusive = 0
+        self.bus_upgrades = 0
+        self.invalidations = 0
+        self.flushes = 0 #Write-backs forçados por snoop em linha M
+
+    def attach(self, cache):
+        self.caches.append(cache)
+
+    def _broadcast(self, requester, block_start, exclusive):
+        shared = False
+        for cache in self.caches:
+            if cache is not requester and cache.snoop(block_start, exclusive, requester.core_id):
+                shared = True
+        return shared
+
+    def read_miss(self, requester, block_start):
+        self.bus_reads += 1
+        return self._broadcast(requester, block_start, False)
+
+    def read_exclusive(self, requester, block_start):
+        self.bus_read_exclusive += 1
+        self._broadcast(requester, block_start, True)
+
+    def upgrade(self, requester, block_start):
+        self.bus_upgrades += 1
+        self._broadcast(requester, block_start, True)
+
+    def notify_write(self, requester):
+        self.writes += 1
+
+#Cache comum que anota quais blocos foram lidos/escritos (usada nos workers paralelos)
+class _TrackingCache(Cache):
+    def __init__(self, memory_ref, num_lines=8, block_size=4):
+        super().__init__(memory_ref, num_lines=num_lines, block_size=block_size)
+        self.read_blocks = set()
+        self.written_blocks = set()
+
+    def read(self, address):
+        self.read_blocks.add(address // self.block_size)
+        return super().read(address)
+
+    def write(self, address, value):
+        self.written_blocks.add(address // self.block_size)
+        super().write(address, value)
+
+#Roda um core sozinho num processo separado, sobre uma cópia da memória
+def _run_isolated_core(memory, registers, max_steps, num_lines, block_size, loop_detection):
+    core = MIC1Hardware(loop_detection=loop_detection, trace_micro=False)
+    core.memory = memory
+    core.inst_cache = _TrackingCache(memory, num_lines, block_size)
+    core.data_cache = _TrackingCache(memory, num_lines, block_size)
+    core.registers = registers
+    steps = core.run(max_steps)
+    core.data_cache.flush_all()
+    return {
+        'registers': core.registers, 'halted': core.halted, 'steps': steps,
+        'stop_reason': core.stop_reason, 'stop_info': core.stop_info,
+        'memory': core.memory,
+        'read_blocks': core.inst_cache.read_blocks | core.data_cache.read_blocks,
+        'written_blocks': core.data_cache.written_blocks,
+        'i_hits': core.inst_cache.hits, 'i_misses': core.inst_cache.misses,
+        'd_hits': core.data_cache.hits, 'd_misses': core.data_cache.misses,
+    }
+
+#Sistema com N cores MIC-1, caches I/D privadas com MESI e uma única RAM compartilhada
+class MultiCoreMIC1:
+    def __init__(self, num_cores=2, num_lines=8, block_size=4, stack_size=256, quantum=1, seed=None, loop_detection=False):
+        self.MEMORY_SIZE = 4096
+        self.num_cores = num_cores
+        self.num_lines = num_lines
+        self.block_size = block_size
+        self.stack_size = stack_size #Cada core ganha a sua pilha, abaixo da do core anterior
+        self.quantum = quantum #Instruções por core a cada rodada do escalonador
+        self.seed = seed #Com seed, a ordem dos cores em cada rodada é sorteada (mas reproduzível)
+        #Detecção de loop: cada core só checa salto p/ si mesmo; a amostragem de estados é feita
+        #aqui, com o estado de todos os cores, porque um core esperando uma flag parece preso
+        #até outro core escrever nela
+        self.loop_detection = loop_detection
+        self.loop_check_interval = 64 #Rodadas entre amostras
+        self.reset()
+
+    #Recria RAM, barramento e cores. Não use core.reset() direto: ele desfaz o compartilhamento
+    def reset(self):
+        self.memory = [0] * self.MEMORY_SIZE
+        self.bus = SnoopingBus()
+        self.cores = []
+        for i in range(self.num_cores):
+            core = MIC1Hardware(loop_detection=self.loop_detection, trace_micro=False)
+            core.loop_sampling = False
+            core.memory = self.memory
+            core.inst_cache = MESICache(self.memory, self.bus, i, self.num_lines, self.block_size, 'I-CACHE', core.event_log)
+            core.data_cache = MESICache(self.memory, self.bus, i, self.num_lines, self.block_size, 'D-CACHE', core.event_log)
+            core.registers['SP'] = 4095 - i * self.stack_size
+            self.bus.cores.append(core)
+            self.cores.append(core)
+        self.core_steps = [0] * self.num_cores
+        self.rounds = 0
+        self.stop_core = None #Core que parou num breakpoint/watchpoint
+        self._rng = random.Random(self.seed) if self.seed is not None else None
+        self._loop_countdown = self.loop_check_interval
+        self._loop_seen = set()
+        self._loop_writes = 0
+        self._loop_target = None #Estado global repetido; enquanto não é None medimos os loops
+        self._loop_ranges = None #[início, fim] do loop de cada core
+
+    #Carrega o programa uma vez na RAM; entry_points define o PC inicial de cada core (endereço ou label)
+    def load_program(self, program_data, entry_points=None, labels=None):
+        if entry_points and len(entry_points) != self.num_cores:
+            raise ValueError(f"São {self.num_cores} cores, mas foram dados {len(entry_points)} pontos de entrada.")
+        self.reset()
+        for i, value in enumerate(program_data):
+            if i < self.MEMORY_SIZE:
+                self.memory[i] = value
+        for i, core in enumerate(self.cores):
+            if labels:
+                core.labels = dict(labels)
+            if entry_points:
+                core.registers['PC'] = core._resolve_address(entry_points[i])
+
+    @property
+    def halted(self):
+        return all(core.halted for core in self.cores)
+
+    #Uma rodada do escalonador: cada core ativo executa até `quantum` instruções
+    #Retorna False se algum core parou num breakpoint/watchpoint
+    def step(self, limit=None):
+        self.rounds += 1
+        order = list(range(self.num_cores))
+        if self._rng:
+            self._rng.shuffle(order)
+        for i in order:
+            core = self.cores[i]
+            for _ in range(self.quantum):
+                if core.halted or (limit is not None and limit[i] <= 0):
+                    break
+                if self._loop_ranges is not None:
+                    pc = core.registers['PC']
+                    r = self._loop_ranges[i]
+                    if pc < r[0]: r[0] = pc
+                    if pc > r[1]: r[1] = pc
+                core.step()
+                self.core_steps[i] += 1
+                if limit is not None:
+                    limit[i] -= 1
+                if core.stop_reason in ('BREAKPOINT', 'WATCH_READ', 'WATCH_WRITE'):
+                    self.stop_core = i
+                    return False
+        if self.loop_detection:
+            self._check_system_loop(limit)
+        return True
+
+    def _system_state(self):
+        return tuple((c.registers['PC'], c.registers['AC'], c.registers['SP'], c.halted) for c in self.cores)
+
+    #Se o estado de todos os cores se repete sem nenhuma escrita no meio, nenhum core pode
+    #mais mudar o que os outros leem: todos os que não pararam estão presos p/ sempre
+    def _check_system_loop(self, limit):
+        if self.halted:
+            return
+        #Core parado pelo limite de passos não anda, e aí o estado repetiria à toa
+        if limit is not None and any(n <= 0 for n, c in zip(limit, self.cores) if not c.halted):
+            return
+
+        state = self._system_state()
+        if self._loop_target is not None:
+            #Demos uma volta completa: já temos o intervalo de cada core
+            if state == self._loop_target:
+                for core, (start, end) in zip(self.cores, self._loop_ranges):
+                    if not core.halted:
+                        core._halt_loop(start, end)
+                self._loop_target = self._loop_ranges = None
+            return
+
+        self._loop_countdown -= 1
+        if self._loop_countdown:
+            return
+        self._loop_countdown = self.loop_check_interval
+
+        if self.bus.writes != self._loop_writes:
+            self._loop_seen.clear()
+            self._loop_writes = self.bus.writes
+        elif state in self._loop_seen:
+            self._loop_target = state
+            self._loop_ranges = [[c.registers['PC'], c.registers['PC']] for c in self.cores]
+            return
+        if len(self._loop_seen) >= 4096:
+            self._loop_seen.clear()
+        self._loop_seen.add(state)
+
+    #Execução intercalada e determinística até todos pararem (ou max_steps instruções por core)
+    def run(self, max_steps=None):
+        self.stop_core = None
+        for i, core in enumerate(self.cores):
+            if core.break_at_current_pc():
+                self.stop_core = i
+                return self.core_steps
+        limit = [max_steps] * self.num_cores if max_steps is not None else None
+        while not self.halted:
+            if limit is not None and all(n <= 0 or core.halted for n, core in zip(limit, self.cores)):
+                break
+            if not self.step(limit):
+                break
+        return self.core_steps
+
+    #Roda cada core num processo separado. Só vale se os cores não compartilham blocos:
+    #se algum bloco escrito por um core foi tocado por outro, o resultado é descartado e
+    #o sistema roda intercalado com run(). Breakpoints/watchpoints não valem no modo paralelo
+    #Retorna 'parallel' ou 'interleaved', conforme o modo que ficou valendo
+    def run_parallel(self, max_steps, workers=None):
+        #A RAM precisa estar atualizada antes de ser copiada p/ os workers
+        for core in self.cores:
+            core.data_cache.flush_all()
+            core.inst_cache.flush_all()
+
+        active = [i for i, core in enumerate(self.cores) if not core.halted]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                i: pool.submit(_run_isolated_core, list(self.memory), dict(self.cores[i].registers),
+                               max_steps, self.num_lines, self.block_size, self.cores[i].loop_detection)
+                for i in active
+            }
+            results = {i: f.result() for i, f in futures.items()}
+
+        for i in active:
+            written = results[i]['written_blocks']
+            for j in active:
+                if i != j and written & (results[j]['read_blocks'] | results[j]['written_blocks']):
+                    self.run(max_steps)
+                    return 'interleaved'
+
+        for i in active:
+            res = results[i]
+            core = self.cores[i]
+            for block in res['written_blocks']:
+                start = block * self.block_size
+                end = min(start + self.block_size, self.MEMORY_SIZE)
+                self.memory[start:end] = res['memory'][start:end]
+            core.registers = res['registers']
+            core.halted = res['halted']
+            core.stop_reason = res['stop_reason']
+            core.stop_info = res['stop_info']
+            core.inst_cache.hits += res['i_hits']
+            core.inst_cache.misses += res['i_misses']
+            core.data_cache.hits += res['d_hits']
+            core.data_cache.misses += res['d_misses']
+            self.core_steps[i] += res['steps']
+
+        #A RAM mudou por fora do barramento: as caches começam frias de novo
+        for core in self.cores:
+            core.inst_cache.invalidate_all()
+            core.data_cache.invalidate_all()
+        return 'parallel'
+
+    #Estatísticas por core e do barramento
+    def stats(self):
+        cores = []
+        for i, core in enumerate(self.cores):
+            ic, dc = core.inst_cache, core.data_cache
+            cores.append({
+                'core': i, 'steps': self.core_steps[i], 'halted': core.halted,
+                'i_hits': ic.hits, 'i_misses': ic.misses,
+                'd_hits': dc.hits, 'd_misses': dc.misses,
+                'coherence_misses': ic.coherence_misses + dc.coherence_misses,
+                'invalidations': ic.invalidations + dc.invalidations,
+            })
+        bus = {
+            'bus_reads': self.bus.bus_reads, 'bus_read_exclusive': self.bus.bus_read_exclusive,
+            'bus_upgrades': self.bus.bus_upgrades, 'invalidations': self.bus.invalidations,
+            'flushes': self.bus.flushes,
+        }
+        return {'cores': cores, 'bus': bus}
@@ -0,0 +1,279 @@
+import argparse
+import asyncio
+import itertools
+import json
+from mic1_hardware import MIC1Hardware, format_event
+from assembler import MIC1Assembler
+
+#Servidor local (sem Tk) que mantém várias sessões de simulação abertas ao mesmo tempo
+#Protocolo: uma requisição JSON por linha, uma resposta JSON por linha
+#  {"id": 1, "op": "open"}                                -> {"id": 1, "ok": true, "session": "s1"}
+#  {"id": 2, "op": "load", "session": "s1", "source": "LOCO 1\nHALT"}
+#  {"id": 3, "op": "run", "session": "s1", "steps": 1000}
+#  {"id": 4, "op": "memory", "session": "s1", "start": 0, "end": 15}
+#Erros voltam como {"id": ..., "ok": false, "error": "..."}
+
+#Quantos ciclos rodamos antes de devolver o controle ao event loop (p/ atender as outras sessões)
+RUN_CHUNK = 2000
+
+#Tamanho máximo de uma requisição (o padrão do asyncio, 64 KiB, não cabe um programa grande)
+LINE_LIMIT = 16 * 1024 * 1024
+
+#Uma sessão = um id + o hardware dela (os labels ficam no próprio hardware)
+class Session:
+    def __init__(self, session_id, cpu):
+        self.id = session_id
+        self.cpu = cpu
+
+#Pool de hardwares já instanciados, p/ abrir sessão não custar nada
+class SessionPool:
+    def __init__(self, size=4, loop_detection=False):
+        self.loop_detection = loop_detection
+        self.free = [self._new_cpu() for _ in range(size)]
+        self.sessions = {}
+        self._ids = itertools.count(1)
+
+    #Microoperações ficam desligadas por padrão: só são montadas se o cliente pedir (trace)
+    def _new_cpu(self):
+        return MIC1Hardware(loop_detection=self.loop_detection, trace_micro=False)
+
+    def acquire(self, trace=False):
+        cpu = self.free.pop() if self.free else self._new_cpu()
+        cpu.trace_micro = trace
+        session = Session(f"s{next(self._ids)}", cpu)
+        self.sessions[session.id] = session
+        return session
+
+    def release(self, session_id):
+        session = self.sessions.pop(session_id, None)
+        if session is None:
+            return
+        #Devolve o hardware limpo p/ a próxima sessão
+        session.cpu.reset()
+        session.cpu.clear_debug()
+        self.free.append(session.cpu)
+
+    def get(self, session_id):
+        if session_id not in self.sessions:
+            raise KeyError(f"Sessão '{session_id}' não existe.")
+        return self.sessions[session_id]
+
+class MIC1Server:
+    def __init__(self, pool_size=4, loop_detection=False, line_limit=LINE_LIMIT):
+        self.pool = SessionPool(pool_size, loop_detection)
+        self.line_limit = line_limit
+        self.assembler = MIC1Assembler()
+        self.ops = {
+            'ping': self.op_ping,
+            'open': self.op_open,
+            'close': self.op_close,
+            'assemble': self.op_assemble,
+            'load': self.op_load,
+            'run': self.op_run,
+            'snapshot': self.op_snapshot,
+            'memory': self.op_memory,
+            'breakpoint': self.op_breakpoint,
+            'watchpoint': self.op_watchpoint,
+            'events': self.op_events,
+        }
+
+    #Cada conexão só enxerga as sessões que ela mesma abriu
+    def _session(self, req, owned):
+        session_id = req['session']
+        if session_id not in owned:
+            raise KeyError(f"Sessão '{session_id}' não existe.")
+        return self.pool.get(session_id)
+
+    def _assemble(self, source):
+        binary, errors = self.assembler.compile(source)
+        return binary, errors, dict(self.assembler.labels)
+
+    async def op_ping(self, req, owned):
+        return {}
+
+    async def op_open(self, req, owned):
+        session = self.pool.acquire(bool(req.get('trace')))
+        owned.add(session.id)
+        return {'session': session.id}
+
+    async def op_close(self, req, owned):
+        session = self._session(req, owned)
+        self.pool.release(session.id)
+        owned.discard(session.id)
+        return {}
+
+    async def op_assemble(self, req, owned):
+        binary, errors, labels = self._assemble(req['source'])
+        return {'binary': binary, 'errors': errors, 'labels': labels}
+
+    #Carrega um binário pronto ou compila "source" antes
+    async def op_load(self, req, owned):
+        session = self._session(req, owned)
+        if 'source' in req:
+            binary, errors, labels = self._assemble(req['source'])
+            if errors:
+                return {'errors': errors, 'loaded': False}
+        else:
+            binary, labels = req['binary'], req.get('labels', {})
+        session.cpu.load_program(binary, labels)
+        return {'loaded': True, 'size': len(binary), 'labels': labels}
+
+    #Roda em blocos de RUN_CHUNK ciclos, cedendo o event loop entre eles
+    async def op_run(self, req, owned):
+        cpu = self._session(req, owned).cpu
+        remaining = req.get('steps', 1)
+        total = 0
+        while remaining > 0 and not cpu.halted:
+            done = cpu.run(min(remaining, RUN_CHUNK))
+            total += done
+            remaining -= done
+            if cpu.stop_reason in ('BREAKPOINT', 'WATCH_READ', 'WATCH_WRITE'):
+                break
+            await asyncio.sleep(0)
+        return {'steps': total, 'halted': cpu.halted, 'stop_reason': cpu.stop_reason, 'stop_info': cpu.stop_info}
+
+    async def op_snapshot(self, req, owned):
+        cpu = self._session(req, owned).cpu
+        caches = {}
+        for name, cache in (('data', cpu.data_cache), ('inst', cpu.inst_cache)):
+            caches[name] = {
+                'hits': cache.hits, 'misses': cache.misses,
+                'lines': [{'valid': l.valid, 'tag': l.tag, 'dirty': l.dirty, 'data': list(l.data)} for l in cache.lines],
+            }
+        return {
+            'registers': dict(cpu.registers), 'halted': cpu.halted,
+            'stop_reason': cpu.stop_reason, 'stop_info': cpu.stop_info,
+            'micro_log': list(cpu.micro_log), 'caches': caches,
+        }
+
+    #Intervalo [start, end] da memória como o programa enxerga: RAM + linhas sujas da cache de dados
+    #Não passa por cache.read(), então não mexe nos contadores de hit/miss
+    async def op_memory(self, req, owned):
+        cpu = self._session(req, owned).cpu
+        start = max(0, req.get('start', 0))
+        end = min(cpu.MEMORY_SIZE - 1, req.get('end', start))
+        values = cpu.memory[start:end + 1]
+        cache = cpu.data_cache
+        for idx, line in enumerate(cache.lines):
+            if not (line.valid and line.dirty):
+                continue
+            block_addr = (line.tag * cache.num_lines + idx) * cache.block_size
+            for i, val in enumerate(line.data):
+                if start <= block_addr + i <= end:
+                    values[block_addr + i - start] = val
+        return {'start': start, 'values': values}
+
+    #Esvazia o log de eventos da sessão (buffer circular: só os mais recentes ficam guardados)
+    #"kinds" filtra por tipo, ex: ["MISS", "WRITEBACK"]
+    async def op_events(self, req, owned):
+        cpu = self._session(req, owned).cpu
+        kinds = req.get('kinds')
+        records = cpu.event_log.drain()
+        if kinds:
+            records = [r for r in records if r[1] in kinds]
+        return {'events': [format_event(r) for r in records]}
+
+    async def op_breakpoint(self, req, owned):
+        cpu = self._session(req, owned).cpu
+        if req.get('remove'):
+            cpu.remove_breakpoint(req['location'])
+            return {}
+        return {'address': cpu.add_breakpoint(req['location'], req.get('condition'))}
+
+    async def op_watchpoint(self, req, owned):
+        cpu = self._session(req, owned).cpu
+        args = (req['start'], req.get('end'), req.get('mode', 'rw'))
+        if req.get('remove'):
+            cpu.remove_watchpoint(*args)
+        else:
+            cpu.add_watchpoint(*args)
+        return {}
+
+    async def handle_request(self, line, owned):
+        try:
+            req = json.loads(line)
+        except ValueError:
+            return {'ok': False, 'error': 'JSON inválido.'}
+        if not isinstance(req, dict):
+            return {'ok': False, 'error': 'A requisição deve ser um objeto JSON.'}
+        resp = {'id': req.get('id')}
+        op = self.ops.get(req.get('op'))
+        if op is None:
+            resp.update(ok=False, error=f"Operação desconhecida '{req.get('op')}'.")
+            return resp
+        #Qualquer erro vira resposta {"ok": false}; a conexão e as sessões dela continuam de pé
+        try:
+            resp.update(await op(req, owned))
+            resp['ok'] = True
+        except Exception as e:
+            resp.update(ok=False, error=str(e.args[0]) if e.args else type(e).__name__)
+        return resp
+
+    #Lê uma linha. Se ela passar de line_limit, descarta o resto dela e retorna None
+    async def _read_line(self, reader):
+        try:
+            return await reader.readuntil(b"\n")
+        except asyncio.IncompleteReadError as e:
+            return e.partial #Fim da conexão (com ou sem uma última linha sem \n)
+        except asyncio.LimitOverrunError as e:
+            consumed = e.consumed
+        while True:
+            await reader.readexactly(consumed)
+            try:
+                await reader.readuntil(b"\n")
+                return None
+            except asyncio.LimitOverrunError as e:
+                consumed = e.consumed
+
+    #Uma conexão por cliente; as sessões abertas por ela são liberadas quando ela cai
+    async def handle_client(self, reader, writer):
+        owned = set()
+        try:
+            while True:
+                line = await self._read_line(reader)
+                if line is None:
+                    resp = {'ok': False, 'error': f"Requisição maior que o limite de {self.line_limit} bytes."}
+                elif not line:
+                    break
+                elif not line.strip():
+                    continue
+                else:
+                    resp = await self.handle_request(line, owned)
+                writer.write(json.dumps(resp).encode() + b"\n")
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            for session_id in list(owned):
+                self.pool.release(session_id)
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def serve(self, host='127.0.0.1', port=8765, unix_path=None):
+        if unix_path:
+            server = await asyncio.start_unix_server(self.handle_client, path=unix_path, limit=self.line_limit)
+        else:
+            server = await asyncio.start_server(self.handle_client, host, port, limit=self.line_limit)
+        async with server:
+            await server.serve_forever()
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor local do simulador MIC-1 (JSON por linha)")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix', help="Caminho de Unix socket (no lugar de host/porta)")
+    parser.add_argument('--pool', type=int, default=4, help="Sessões pré-criadas")
+    parser.add_argument('--loop-detection', action='store_true', help="Para programas presos em loop infinito")
+    args = parser.parse_args()
+
+    server = MIC1Server(args.pool, args.loop_detection)
+    try:
+        asyncio.run(server.serve(args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
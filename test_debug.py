@@ -0,0 +1,89 @@
+import pytest
+from mic1_hardware import MIC1Hardware
+from assembler import MIC1Assembler
+
+#Checagens de breakpoints e watchpoints (rodar com pytest)
+
+def load(source):
+    asm = MIC1Assembler()
+    binary, errors = asm.compile(source)
+    assert not errors, errors
+    cpu = MIC1Hardware()
+    cpu.load_program(binary, asm.labels)
+    return cpu
+
+#Conta de 3 até -1, passando por "loop" a cada volta
+COUNTDOWN = "LOCO 3\nSTOD 100\nloop: LODD 100\nSUBD one\nSTOD 100\nJPOS loop\nHALT\none: 1"
+
+@pytest.mark.parametrize("condition", [
+    "ac < 0",                                    #registrador que não existe
+    "open('x')",                                 #chamada de função
+    "().__class__.__base__.__subclasses__()",
+    "AC in 1", "AC not in 1", "AC is 1", "AC is not 1",
+    "AC < 1.5", "AC == 'a'", "AC == None",       #constantes que não são inteiras
+    "AC ** 99", "AC // 0", "AC << 99",
+    "AC <",                                      #sintaxe inválida
+])
+def test_rejected_conditions(condition):
+    cpu = load(COUNTDOWN)
+    with pytest.raises(ValueError):
+        cpu.add_breakpoint("loop", condition)
+    assert not cpu.breakpoints
+
+def test_condition_stops_only_when_true():
+    cpu = load(COUNTDOWN)
+    cpu.add_breakpoint("loop", "AC < 0 and not SP != 4095")
+    cpu.run(1000)
+    #Só para quando o AC (signed) ficou negativo: antes o JPOS já teria saído do loop
+    assert cpu.stop_reason == 'HALT'
+
+    cpu = load(COUNTDOWN)
+    cpu.add_breakpoint("loop", "AC == 1")
+    cpu.run(1000)
+    assert cpu.stop_reason == 'BREAKPOINT'
+    assert cpu.stop_info == {'pc': 2}
+    assert cpu.registers['AC'] == 1
+    cpu.run(1000)
+    assert cpu.stop_reason == 'HALT'
+
+def test_breakpoint_on_current_pc():
+    cpu = load("start: LOCO 1\nHALT")
+    cpu.add_breakpoint("start")
+    assert cpu.run() == 0
+    assert cpu.stop_reason == 'BREAKPOINT'
+    assert cpu.stop_info == {'pc': 0}
+    #Retomando da mesma parada o breakpoint é pulado uma vez
+    cpu.run()
+    assert cpu.stop_reason == 'HALT'
+    assert cpu.registers['AC'] == 1
+
+def test_watchpoint_range_validation():
+    cpu = load("HALT")
+    cpu.add_watchpoint(4000, 3_000_000, mode='w')
+    assert cpu.write_watch == set(range(4000, 4096))
+    assert not cpu.read_watch
+    with pytest.raises(ValueError):
+        cpu.add_watchpoint(5, 2)
+    with pytest.raises(ValueError):
+        cpu.add_watchpoint(5000, 6000)
+    with pytest.raises(ValueError):
+        cpu.add_watchpoint(1, 2, mode='x')
+    cpu.remove_watchpoint(0, 4095, mode='w')
+    assert not cpu.write_watch
+
+def test_read_and_write_watch_stops():
+    cpu = load("LOCO 7\nSTOD 50\nLODD 51\nLODD 50\nHALT")
+    cpu.add_watchpoint(50, mode='r')
+    cpu.add_watchpoint(51, mode='w')
+    #A escrita em 50 e a leitura de 51 não estão sendo observadas
+    cpu.run()
+    assert cpu.stop_reason == 'WATCH_READ'
+    assert cpu.stop_info == {'pc': 3, 'addr': 50, 'value': 7}
+
+    cpu = load("LOCO 7\nSTOD 50\nHALT")
+    cpu.add_watchpoint(50, mode='w')
+    cpu.run()
+    assert cpu.stop_reason == 'WATCH_WRITE'
+    assert cpu.stop_info == {'pc': 1, 'addr': 50, 'value': 7}
+    cpu.run()
+    assert cpu.stop_reason == 'HALT'
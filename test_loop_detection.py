@@ -0,0 +1,57 @@
+from mic1_hardware import MIC1Hardware
+from assembler import MIC1Assembler
+
+#Checagens da detecção de loop infinito (rodar com pytest ou "python test_loop_detection.py")
+
+def load(source, loop_detection=True):
+    asm = MIC1Assembler()
+    binary, errors = asm.compile(source)
+    assert not errors, errors
+    cpu = MIC1Hardware(loop_detection=loop_detection)
+    cpu.load_program(binary, asm.labels)
+    return cpu
+
+def test_self_jump_detected_at_once():
+    cpu = load("LOCO 1\nx: JUMP x")
+    assert cpu.run(100000) == 2
+    assert cpu.halted
+    assert cpu.stop_reason == 'LOOP'
+    assert cpu.stop_info == {'start': 1, 'end': 1}
+
+def test_conditional_self_jump_detected():
+    #AC == 0, então o JZER sempre salta p/ ele mesmo
+    cpu = load("x: JZER x")
+    cpu.run(100000)
+    assert cpu.stop_reason == 'LOOP'
+    assert cpu.stop_info == {'start': 0, 'end': 0}
+
+def test_sampled_cycle_reports_range():
+    #Mem[51] é 0, então o AC nunca muda e o JNZE volta p/ loop p/ sempre
+    cpu = load("LOCO 5\nSTOD 50\nloop: LODD 50\nSUBD 51\nJNZE loop\nHALT")
+    steps = cpu.run(100000)
+    assert cpu.stop_reason == 'LOOP'
+    assert cpu.stop_info == {'start': 2, 'end': 4}
+    assert steps < 1000
+
+def test_terminating_loop_not_flagged():
+    cpu = load("LOCO 3\nSTOD 100\nloop: LODD 100\nLOCO 1\nSTOD 101\nLODD 100\nSUBD 101\nSTOD 100\nJPOS loop\nHALT")
+    cpu.run(100000)
+    assert cpu.stop_reason == 'HALT'
+    assert cpu.memory[100] == 65535
+
+def test_long_countdown_without_writes_not_flagged():
+    #O AC muda a cada volta, então o estado nunca se repete
+    cpu = load("LOCO 3000\nloop: SUBD one\nJNZE loop\nHALT\none: 1")
+    cpu.run(100000)
+    assert cpu.stop_reason == 'HALT'
+
+def test_disabled_by_default():
+    cpu = load("x: JUMP x", loop_detection=False)
+    assert cpu.run(1000) == 1000
+    assert not cpu.halted
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_"):
+            func()
+            print(f"{name}: ok")
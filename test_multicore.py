@@ -0,0 +1,119 @@
+import pytest
+from mic1_hardware import format_event
+from mic1_multicore import MultiCoreMIC1
+from assembler import MIC1Assembler
+
+#Checagens do sistema multi-core (rodar com pytest ou "python test_multicore.py")
+
+def load(source, entry_points, **kwargs):
+    asm = MIC1Assembler()
+    binary, errors = asm.compile(source)
+    assert not errors, errors
+    system = MultiCoreMIC1(**kwargs)
+    system.load_program(binary, entry_points, asm.labels)
+    return system, asm.labels
+
+#Core 0 espera a flag; core 1 conta de 500 até 0 (sem escrever nada) e só então levanta a flag
+HANDSHAKE = """
+c0: LODD flag
+JZER c0
+LOCO 7
+STOD out
+HALT
+c1: LOCO 500
+w: SUBD one
+JNZE w
+LOCO 1
+STOD flag
+HALT
+one: 1
+flag: 0
+out: 0
+"""
+
+def test_spin_wait_is_not_a_loop():
+    for seed in (None, 1):
+        system, labels = load(HANDSHAKE, ['c0', 'c1'], loop_detection=True, seed=seed)
+        system.run(100000)
+        assert [c.stop_reason for c in system.cores] == ['HALT', 'HALT']
+        assert system.memory[labels['out']] == 7
+
+def test_all_cores_spinning_is_a_loop():
+    #Ninguém nunca escreve nas flags: os dois cores ficam presos
+    system, labels = load("a: LODD f1\nJZER a\nHALT\nb: LODD f2\nJZER b\nHALT\nf1: 0\nf2: 0", ['a', 'b'], loop_detection=True)
+    system.run(100000)
+    assert [c.stop_reason for c in system.cores] == ['LOOP', 'LOOP']
+    assert system.cores[0].stop_info == {'start': 0, 'end': 1}
+    assert system.cores[1].stop_info == {'start': 3, 'end': 4}
+
+def test_self_jump_stops_only_that_core():
+    system, labels = load("x: JUMP x\ny: LOCO 9\nSTOD out\nHALT\nout: 0", ['x', 'y'], loop_detection=True)
+    system.run(1000)
+    assert system.cores[0].stop_reason == 'LOOP'
+    assert system.cores[1].stop_reason == 'HALT'
+    assert system.memory[labels['out']] == 9
+
+def test_mesi_transitions():
+    system, labels = load("HALT", [0, 0])
+    c0, c1 = system.cores[0].data_cache, system.cores[1].data_cache
+    line = lambda cache, addr: cache.lines[cache._get_line_index(addr)]
+
+    c0.read(200)
+    assert line(c0, 200).state == 'E'
+    c1.read(200)
+    assert line(c0, 200).state == 'S' and line(c1, 200).state == 'S'
+
+    #Escrita em S: BusUpgr invalida a cópia do outro core
+    c1.write(201, 5)
+    assert line(c1, 200).state == 'M' and line(c0, 200).state == 'I'
+    assert system.bus.bus_upgrades == 1
+    assert c0.invalidations == 1
+
+    #Leitura do outro core: quem está em M faz flush e os dois ficam em S
+    assert c0.read(201) == 5
+    assert line(c0, 200).state == 'S' and line(c1, 200).state == 'S'
+    assert system.memory[201] == 5
+    assert c0.coherence_misses == 1
+    assert system.bus.flushes == 1
+
+    #Escrita com miss: BusRdX invalida todos
+    c0.write(202, 6)
+    assert line(c0, 200).state == 'M' and line(c1, 200).state == 'I'
+
+def test_mesi_event_records():
+    system, labels = load("HALT", [0, 0])
+    c0, c1 = system.cores[0].data_cache, system.cores[1].data_cache
+    c0.read(200)
+    c1.read(200)
+    c1.write(200, 1)
+    c1.write(200, 2)
+    events0 = [format_event(r) for r in system.cores[0].event_log.drain()]
+    events1 = [format_event(r) for r in system.cores[1].event_log.drain()]
+    assert "[D-CACHE] SNOOP: Bloco 200 invalidado por escrita do core 1" in events0
+    assert "[D-CACHE] Cache WRITE HIT em 200 (L2, S -> M)" in events1
+    assert "[D-CACHE] Cache WRITE HIT em 200 (L2, M)" in events1
+
+def test_entry_points_must_match_cores():
+    with pytest.raises(ValueError):
+        load("HALT", [0])
+    with pytest.raises(ValueError):
+        load("HALT", [0, 0, 0])
+
+def test_run_parallel_disjoint():
+    system, labels = load("a: LOCO 1\nSTOD 300\nADDD 300\nSTOD 301\nHALT\nb: LOCO 5\nSTOD 400\nHALT", ['a', 'b'])
+    assert system.run_parallel(1000) == 'parallel'
+    assert system.memory[300:302] == [1, 2]
+    assert system.memory[400] == 5
+    assert system.core_steps == [5, 3]
+
+def test_run_parallel_falls_back_when_sharing():
+    system, labels = load(HANDSHAKE, ['c0', 'c1'], loop_detection=True)
+    assert system.run_parallel(100000) == 'interleaved'
+    assert system.memory[labels['out']] == 7
+    assert [c.stop_reason for c in system.cores] == ['HALT', 'HALT']
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_"):
+            func()
+            print(f"{name}: ok")
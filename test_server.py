@@ -0,0 +1,110 @@
+import asyncio
+import json
+from mic1_server import MIC1Server
+
+#Checagens do servidor local (rodar com pytest). Cada teste sobe o servidor numa porta livre
+
+async def start(**kwargs):
+    srv = MIC1Server(pool_size=2, **kwargs)
+    server = await asyncio.start_server(srv.handle_client, '127.0.0.1', 0, limit=srv.line_limit)
+    port = server.sockets[0].getsockname()[1]
+    return srv, server, port
+
+async def connect(port):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+
+    async def call(**req):
+        writer.write(json.dumps(req).encode() + b"\n")
+        await writer.drain()
+        return json.loads(await reader.readline())
+    return call, reader, writer
+
+def run(coro):
+    return asyncio.run(coro)
+
+def test_session_lifecycle():
+    async def main():
+        srv, server, port = await start()
+        async with server:
+            call, reader, writer = await connect(port)
+            session = (await call(id=1, op='open'))['session']
+
+            resp = await call(id=2, op='load', session=session, source="LOCO 7\nSTOD 10\nHALT")
+            assert resp['ok'] and resp['loaded'] and resp['size'] == 3
+
+            resp = await call(id=3, op='run', session=session, steps=100)
+            assert resp['ok'] and resp['steps'] == 3 and resp['stop_reason'] == 'HALT'
+
+            resp = await call(id=4, op='memory', session=session, start=9, end=11)
+            assert resp == {'id': 4, 'ok': True, 'start': 9, 'values': [0, 7, 0]}
+
+            assert (await call(id=5, op='close', session=session))['ok']
+            assert not (await call(id=6, op='run', session=session))['ok']
+            assert len(srv.pool.free) == 2
+            writer.close()
+            await writer.wait_closed()
+    run(main())
+
+def test_sessions_are_scoped_to_their_connection():
+    async def main():
+        srv, server, port = await start()
+        async with server:
+            call_a, _, writer_a = await connect(port)
+            call_b, _, writer_b = await connect(port)
+            session = (await call_a(op='open'))['session']
+            for op in ('run', 'snapshot', 'memory', 'close'):
+                resp = await call_b(op=op, session=session)
+                assert resp == {'id': None, 'ok': False, 'error': f"Sessão '{session}' não existe."}
+            assert (await call_a(op='run', session=session))['ok']
+            for writer in (writer_a, writer_b):
+                writer.close()
+                await writer.wait_closed()
+    run(main())
+
+def test_errors_keep_the_connection_open():
+    async def main():
+        srv, server, port = await start(line_limit=1024)
+        async with server:
+            call, reader, writer = await connect(port)
+            session = (await call(op='open'))['session']
+            bad = [
+                dict(op='bogus'),
+                dict(op='breakpoint', session=session, location=0, condition='ac < 0'),
+                dict(op='watchpoint', session=session, start=0, mode='x'),
+                dict(op='run', session=session, steps='abc'),
+                dict(op='load', session=session),
+            ]
+            for req in bad:
+                assert not (await call(**req))['ok']
+
+            #Linha maior que o limite: a requisição é recusada, mas a conexão segue
+            resp = await call(op='assemble', source="LOCO 1\n" * 1000)
+            assert not resp['ok'] and 'limite' in resp['error']
+
+            writer.write(b"not json\n")
+            await writer.drain()
+            assert not json.loads(await reader.readline())['ok']
+
+            assert (await call(op='ping'))['ok']
+            assert (await call(op='run', session=session))['ok']
+            writer.close()
+            await writer.wait_closed()
+    run(main())
+
+def test_sessions_return_to_pool_on_disconnect():
+    async def main():
+        srv, server, port = await start()
+        async with server:
+            call, reader, writer = await connect(port)
+            for _ in range(3):
+                assert (await call(op='open'))['ok']
+            assert len(srv.pool.sessions) == 3
+            writer.close()
+            await writer.wait_closed()
+            for _ in range(100):
+                if not srv.pool.sessions:
+                    break
+                await asyncio.sleep(0.01)
+            assert not srv.pool.sessions
+            assert len(srv.pool.free) == 3
+    run(main())